@@ -0,0 +1,46 @@
+"""
+Chargement du script de l'orchestrateur pour les tests (.github/scripts/ai_team_mcp.py)
+
+L'état local (registre, index, disjoncteur, broker) est isolé dans un dossier temporaire
+et le fournisseur par défaut est le serveur LLM local (`mock`): aucun test ne sort du poste.
+"""
+
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPT = ROOT / '.github' / 'scripts' / 'ai_team_mcp.py'
+
+os.environ['AI_TEAM_STATE_DIR'] = tempfile.mkdtemp(prefix='ai-team-tests-')
+os.environ.setdefault('AI_TEAM_PROVIDER', 'mock')
+
+if 'ai_team_mcp' not in sys.modules:
+    _spec = importlib.util.spec_from_file_location('ai_team_mcp', SCRIPT)
+    sys.modules['ai_team_mcp'] = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(sys.modules['ai_team_mcp'])
+ai = sys.modules['ai_team_mcp']
+
+
+def git(cwd, *args) -> str:
+    """Commande git de test (identité fixe, sans configuration globale)"""
+    result = subprocess.run(['git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com',
+                             '-c', 'init.defaultBranch=main', '-C', str(cwd), *args],
+                            capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+def origin_and_clone(root: Path, *clone_args) -> tuple:
+    """Dépôt distant nu avec un commit initial et un clone de travail; retourne (origin, clone)"""
+    origin, seed, clone = root / 'origin.git', root / 'seed', root / 'clone'
+    git(root, 'init', '--quiet', '--bare', str(origin))
+    git(root, 'init', '--quiet', str(seed))
+    (seed / 'README.md').write_text('# Projet\n', encoding='utf-8')
+    git(seed, 'add', '.')
+    git(seed, 'commit', '--quiet', '-m', 'init')
+    git(seed, 'push', '--quiet', str(origin), 'HEAD:refs/heads/main')
+    git(root, 'clone', '--quiet', *clone_args, str(origin), str(clone))
+    return origin, clone
@@ -0,0 +1,19 @@
+"""
+🧪 Copie du script de l'orchestrateur dans les templates (.github/scripts/ai_team_mcp.py)
+
+Sans réseau ni clé API: python -m unittest discover -s test
+"""
+
+import unittest
+
+from support import ROOT, SCRIPT
+
+
+class TemplateMirrorTest(unittest.TestCase):
+    def test_template_script_is_identical(self):
+        template = ROOT / 'templates' / '.github' / 'scripts' / 'ai_team_mcp.py'
+        self.assertEqual(SCRIPT.read_bytes(), template.read_bytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""Stockage d'artefacts adressé par contenu: déduplication, packs et GC des runs anciens"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from support import ai
+
+
+class ArtifactStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def record(self, store: 'ai.ArtifactStore', run_id: str, files: dict, age: int) -> None:
+        """Run enregistré avec une date de référence fixe (ordre des runs pour le GC)"""
+        store.record_run(run_id, {'agent': 'Backend Developer'}, [{'content': run_id}], files)
+        ref = store.refs_dir / ai.hashlib.sha256(run_id.encode('utf-8')).hexdigest()[:32]
+        os.utime(ref, (1000 - age, 1000 - age))
+
+    def test_put_is_deduplicated(self):
+        store = ai.ArtifactStore(self.root)
+        oid = store.put(b'hello')
+        self.assertEqual(store.put(b'hello'), oid)
+        self.assertEqual(len(store._loose_objects()), 1)
+        self.assertEqual(store.get(oid), b'hello')
+
+    def test_compact_packs_loose_objects(self):
+        store = ai.ArtifactStore(self.root)
+        self.record(store, 'run-1', {'index.html': '<p>1</p>', 'package.json': '{}'}, age=1)
+        packed = store.compact()
+        self.assertGreater(packed, 0)
+        self.assertEqual(store._loose_objects(), [])
+        self.assertEqual(len(list(store.packs_dir.glob('*.pack'))), 1)
+        # Relu depuis l'index du pack par une nouvelle instance
+        run = ai.ArtifactStore(self.root).load_run('run-1')
+        self.assertEqual(run['files'], {'index.html': '<p>1</p>', 'package.json': '{}'})
+        self.assertEqual(run['raw_responses'], [{'content': 'run-1'}])
+
+    def test_gc_drops_oldest_runs_and_keeps_shared_objects(self):
+        store = ai.ArtifactStore(self.root, max_bytes=40 * 1024)
+        shared = 'x' * 10
+        for age, run_id in [(3, 'old'), (2, 'middle'), (1, 'new')]:
+            # Contenu peu compressible: ~32 Ko par run une fois compressé
+            self.record(store, run_id, {'shared.txt': shared, 'big.bin': os.urandom(32 * 1024).hex()}, age)
+        store.compact()
+        self.record(store, 'loose', {'shared.txt': shared}, age=0)
+        # Les tailles viennent de l'index et d'un stat: seuls les objets conservés sont relus
+        with mock.patch.object(store, '_read_stored', wraps=store._read_stored) as read:
+            result = store.gc()
+        self.assertEqual(result['runs_dropped'], 2)
+        self.assertEqual([ref['run_id'] for ref in store.runs()], ['new', 'loose'])
+        self.assertEqual(read.call_count, result['objects'])
+        self.assertLessEqual(result['bytes'], 40 * 1024)
+        self.assertIsNone(store.load_run('old'))
+        self.assertEqual(store.load_run('loose')['files'], {'shared.txt': shared})
+        self.assertEqual(store.load_run('new')['files']['shared.txt'], shared)
+        # Un seul pack, plus aucun objet en vrac
+        self.assertEqual(store._loose_objects(), [])
+        self.assertEqual(len(list(store.packs_dir.glob('*.pack'))), 1)
+
+    def test_gc_keeps_the_latest_run_even_above_the_limit(self):
+        store = ai.ArtifactStore(self.root, max_bytes=1024)
+        self.record(store, 'only', {'big.bin': os.urandom(8 * 1024).hex()}, age=0)
+        self.assertEqual(store.gc()['runs_dropped'], 0)
+        self.assertIsNotNone(store.load_run('only'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"""Broker de jobs du pool réparti: baux, reprise, échecs, head-of-line et arrêt sur bail perdu"""
+
+import tempfile
+import threading
+import time
+import types
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from support import ai
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401 (scripts Lua de fakeredis)
+except ImportError:
+    fakeredis = None
+
+
+class BrokerContract:
+    """Scénarios communs aux deux brokers; make_broker(**options) construit un broker vide"""
+
+    def make_broker(self, **options) -> 'ai.JobBroker':
+        raise NotImplementedError
+
+    def test_claim_complete(self):
+        broker = self.make_broker()
+        job_id = broker.enqueue('acme/web', {'title': 'Fix'})
+        job = broker.claim('w1', list(range(broker.shards)))
+        self.assertEqual((job['id'], job['repo'], job['payload'], job['attempts']),
+                         (job_id, 'acme/web', {'title': 'Fix'}, 1))
+        self.assertIsNone(broker.claim('w2', list(range(broker.shards))))
+        self.assertFalse(broker.complete('w2', job_id, {'ok': True}))
+        self.assertTrue(broker.complete('w1', job_id, {'ok': True}))
+        self.assertEqual(broker.stats().get('done'), 1)
+
+    def test_busy_repository_does_not_block_the_queue(self):
+        broker = self.make_broker(shards=1)
+        broker.enqueue('acme/web', {'n': 1})
+        broker.enqueue('acme/web', {'n': 2})
+        other = broker.enqueue('acme/api', {'n': 3})
+        job = broker.claim('w1', [0], busy_repos=('acme/web',))
+        self.assertEqual(job['id'], other)
+        # Les jobs du repository occupé restent en file, dans l'ordre
+        self.assertEqual(broker.claim('w1', [0])['payload'], {'n': 1})
+
+    def test_expired_lease_is_requeued_and_the_old_owner_loses_it(self):
+        broker = self.make_broker(lease_seconds=0.05)
+        job_id = broker.enqueue('acme/web', {})
+        broker.claim('w1', list(range(broker.shards)))
+        time.sleep(0.1)
+        job = broker.claim('w2', list(range(broker.shards)))
+        self.assertEqual((job['id'], job['attempts']), (job_id, 2))
+        self.assertEqual(broker.heartbeat('w1', [job_id]), [job_id])
+        self.assertFalse(broker.complete('w1', job_id, {}))
+        self.assertEqual(broker.heartbeat('w2', [job_id]), [])
+        self.assertIn('w2', broker.live_workers(max_age=60))
+
+    def test_failures_are_retried_up_to_max_attempts(self):
+        broker = self.make_broker(max_attempts=2)
+        job_id = broker.enqueue('acme/web', {})
+        for _ in range(2):
+            job = broker.claim('w1', list(range(broker.shards)))
+            self.assertEqual(job['id'], job_id)
+            broker.fail('w1', job_id, 'boom')
+        self.assertIsNone(broker.claim('w1', list(range(broker.shards))))
+        self.assertEqual(broker.stats().get('failed'), 1)
+
+
+class SQLiteBrokerTest(BrokerContract, unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_broker(self, **options) -> 'ai.JobBroker':
+        return ai.SQLiteBroker(Path(self.tmp.name) / 'broker.db', **options)
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis (avec lupa) non installé")
+class RedisBrokerTest(BrokerContract, unittest.TestCase):
+    def make_broker(self, **options) -> 'ai.JobBroker':
+        server = fakeredis.FakeServer()
+        client = types.SimpleNamespace(Redis=types.SimpleNamespace(
+            from_url=lambda url, **kwargs: fakeredis.FakeRedis(server=server, **kwargs)))
+        with mock.patch.object(ai, 'redis', client):
+            return ai.RedisBroker('redis://fake/0', scan_depth=8, **options)
+
+
+class StealingOrchestrator:
+    """Orchestrateur de test: pendant le job, un autre worker reprend le bail"""
+
+    def __init__(self, broker: 'ai.SQLiteBroker'):
+        self.broker = broker
+        self.stopped = None
+
+    def uses_worktrees(self, repo: str) -> bool:
+        return False
+
+    def process(self, event, stop=None):
+        with self.broker._transaction() as conn:
+            conn.execute("UPDATE jobs SET owner = 'autre-worker'")
+        self.stopped = stop.wait(5)
+        return {'changes_made': 'true'}
+
+
+class DistributedWorkerTest(unittest.TestCase):
+    def test_lost_lease_stops_the_job_and_discards_its_result(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            broker = ai.SQLiteBroker(Path(tmp) / 'broker.db', lease_seconds=3)
+            job_id = broker.enqueue('acme/web', {'repository': 'acme/web', 'number': 1, 'title': 'Fix'})
+            orchestrator = StealingOrchestrator(broker)
+            worker = ai.DistributedWorker(broker, orchestrator, 'w1', threads=1, poll_interval=0.05)
+            with mock.patch.object(broker, 'complete', wraps=broker.complete) as complete:
+                worker.run(idle_exit=0.2)
+            self.assertTrue(orchestrator.stopped)
+            complete.assert_not_called()
+            owner = broker._conn().execute("SELECT owner, status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            self.assertEqual(owner, ('autre-worker', 'leased'))
+
+    def test_stopped_job_is_not_committed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            orchestrator = ai.MultiTenantOrchestrator({}, workers=1)
+            stop = threading.Event()
+            stop.set()
+            outputs = {'changes_made': 'true', 'branch_name': 'b', 'agent': 'a', 'task_summary': 's',
+                       'run_identity': 'r'}
+            event = {'repository': 'acme/web', 'number': '1', 'title': 'Fix', 'body': '', 'received_at': time.time()}
+            pool = mock.Mock()
+            with mock.patch.object(ai.AITeamMCP, 'run', return_value=outputs):
+                result = orchestrator._process(event, pool, Path(tmp), stop)
+            pool.commit.assert_not_called()
+            self.assertEqual(result['changes_made'], 'false')
+
+
+class BrokerDefaultTest(unittest.TestCase):
+    def test_parsing_arguments_creates_no_state(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            state = Path(tmp) / 'state'
+            with mock.patch.object(ai, 'STATE_DIR', state):
+                args = ai.parse_args(['worker', '--threads', '1'])
+            self.assertIsNone(args.broker)
+            self.assertFalse(state.exists())
+            with mock.patch.object(ai, 'STATE_DIR', state), mock.patch.dict(ai.os.environ, {'AI_TEAM_BROKER_URL': ''}):
+                self.assertEqual(ai.default_broker_url(), f"sqlite:///{state / 'broker' / 'broker.db'}")
+
+
+if __name__ == '__main__':
+    unittest.main()
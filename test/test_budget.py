@@ -0,0 +1,77 @@
+"""
+🧪 Budgets de tokens: états du BudgetGuard, rétrogradation de modèle et file des tâches en attente
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from support import ai
+
+
+class BudgetGuardTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ledger = ai.UsageLedger(Path(self.tmp.name) / 'usage.sqlite')
+        self.guard = ai.BudgetGuard(self.ledger, {'AI_TEAM_DAILY_TOKEN_BUDGET': '100', 'AI_TEAM_MAX_CONCURRENCY': '8'})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def spend(self, tokens: int) -> None:
+        self.ledger.record({'prompt_tokens': tokens}, 'model', 'run', 'o/a', '1', 'feature', 'generation')
+
+    def test_states_follow_daily_usage(self):
+        self.assertEqual(self.guard.state(), 'ok')
+        self.spend(80)
+        self.assertEqual(self.guard.state(), 'throttle')
+        self.assertEqual(self.guard.concurrency_limit('throttle'), 2)
+        self.spend(20)
+        self.assertEqual(self.guard.state(), 'exhausted')
+
+    def test_adjust_downgrades_then_refuses(self):
+        payload = {'model': 'large'}
+        self.assertEqual(self.guard.adjust(payload, 'ok', 'small'), payload)
+        self.assertEqual(self.guard.adjust(payload, 'throttle', 'small'), {'model': 'small'})
+        with self.assertRaises(ai.BudgetExceeded):
+            self.guard.adjust(payload, 'exhausted', 'small')
+
+
+class QueuedTasksTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ledger = ai.UsageLedger(Path(self.tmp.name) / 'usage.sqlite')
+        # File partagée par l'état des tests: partir d'une file vide
+        self.ledger.take_queued()
+
+    def tearDown(self):
+        self.ledger.take_queued()
+        self.tmp.cleanup()
+
+    def guard(self, daily: int) -> ai.BudgetGuard:
+        return ai.BudgetGuard(self.ledger, {'AI_TEAM_DAILY_TOKEN_BUDGET': str(daily)})
+
+    def test_take_queued_drains_the_queue(self):
+        self.ledger.queue_task({'repository': 'o/a', 'number': '1'})
+        self.ledger.queue_task({'repository': 'o/a', 'number': '2'})
+        taken = self.ledger.take_queued()
+        self.assertEqual([entry['number'] for entry in taken], ['1', '2'])
+        self.assertIn('queued_at', taken[0])
+        self.assertEqual(self.ledger.take_queued(), [])
+
+    def test_queue_is_kept_while_the_budget_is_exhausted(self):
+        self.ledger.queue_task({'repository': 'o/a', 'number': '1'})
+        self.ledger.record({'prompt_tokens': 10}, 'model', 'run', 'o/a', '1', 'feature', 'generation')
+        self.assertEqual(ai.queued_events(self.guard(10)), [])
+        events = ai.queued_events(self.guard(0))
+        self.assertEqual([event['number'] for event in events], ['1'])
+
+    def test_local_tasks_stay_queued(self):
+        self.ledger.queue_task({'repository': '', 'number': '', 'title': 'Tâche locale'})
+        self.ledger.queue_task({'repository': 'o/a', 'number': '3'})
+        self.assertEqual([event['number'] for event in ai.queued_events(self.guard(0))], ['3'])
+        self.assertEqual([entry['title'] for entry in self.ledger.take_queued()], ['Tâche locale'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+🧪 Disjoncteur du fournisseur LLM: états partagés par SQLite et échec immédiat du client
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from support import ai
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Path(self.tmp.name) / 'breaker.sqlite'
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def breaker(self, **kwargs):
+        return ai.CircuitBreaker(self.db, 'test', **dict({'failure_threshold': 2, 'cooldown': 300}, **kwargs))
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = self.breaker()
+        breaker.record_failure()
+        self.assertEqual(breaker.state(), 'closed')
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state(), 'closed')
+        breaker.record_failure()
+        self.assertEqual(breaker.state(), 'open')
+        self.assertFalse(breaker.allow())
+        # État partagé entre instances (runs, workers) par la base SQLite
+        self.assertEqual(self.breaker().state(), 'open')
+
+    def test_half_open_allows_a_single_probe(self):
+        breaker = self.breaker(cooldown=0)
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state(), 'half_open')
+        self.assertFalse(breaker.allow())
+
+    def test_probe_outcome(self):
+        breaker = self.breaker(cooldown=0)
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state(), 'open')
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state(), 'closed')
+        self.assertTrue(breaker.allow())
+
+    def test_abandoned_probe_is_released(self):
+        breaker = self.breaker(cooldown=0, probe_timeout=0)
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.allow())
+
+
+class ClientCircuitTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.client = ai.LLMClient(ai.load_provider({'AI_TEAM_PROVIDER': 'mock'}), {
+            'AI_TEAM_BREAKER_DB': str(Path(self.tmp.name) / 'breaker.sqlite'),
+            'AI_TEAM_BREAKER_FAILURES': '1', 'AI_TEAM_BREAKER_COOLDOWN': '300'})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_provider_failure_opens_the_circuit(self):
+        with self.assertRaises(ai.requests.ConnectionError), self.client.circuit():
+            raise ai.requests.ConnectionError('refusée')
+        with self.assertRaises(ai.CircuitOpen), self.client.circuit():
+            self.fail('appel malgré le disjoncteur ouvert')
+
+    def test_rejected_request_proves_the_provider_answers(self):
+        with self.assertRaises(ValueError), self.client.circuit():
+            raise ValueError('réponse trop grande')
+        self.assertEqual(self.client.breaker.state(), 'closed')
+
+    def test_breaker_can_be_disabled(self):
+        client = ai.LLMClient(self.client.provider, {'AI_TEAM_CIRCUIT_BREAKER': 'false'})
+        self.assertIsNone(client.breaker)
+        with client.circuit():
+            pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+🧪 Relance automatique d'une génération coupée par max_tokens (complete_files)
+"""
+
+import tempfile
+import unittest
+from unittest import mock
+
+from support import ai
+
+
+def reply(content: str, finish_reason: str = 'stop'):
+    return 200, {'choices': [{'message': {'role': 'assistant', 'content': content}, 'finish_reason': finish_reason}],
+                 'usage': {'prompt_tokens': 10, 'completion_tokens': len(content) // 4}}
+
+
+class ContinuationTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.team = ai.AITeamMCP(env={'AI_TEAM_PROVIDER': 'mock', 'AI_TEAM_WORKSPACE': self.tmp.name,
+                                      'AI_TEAM_MAX_CONTINUATIONS': '1'})
+        self.payload = {'model': 'mock', 'max_tokens': 2000, 'temperature': 0.2,
+                        'messages': [{'role': 'user', 'content': 'Generate files'}]}
+        self.requests = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def complete(self, *responses, parser=None):
+        queue = list(responses)
+
+        def respond(payload):
+            self.requests.append(payload)
+            return queue.pop(0)
+
+        with mock.patch.object(self.team.provider.local_server, 'respond', side_effect=respond):
+            return self.team.complete_files(self.payload, 30, 'generation', parser=parser)
+
+    def test_follow_up_asks_for_the_truncated_file_again(self):
+        content = self.complete(reply('FILE: a.py\nx = 1\n\nFILE: b.py\ny = ', 'length'),
+                                reply('FILE: b.py\ny = 2\n'))
+        self.assertEqual(content, 'FILE: a.py\nx = 1\n\nFILE: b.py\ny = 2\n')
+        assistant, instruction = self.requests[1]['messages'][-2:]
+        # Seuls les fichiers complets sont rendus au modèle, le fichier coupé est redemandé en entier
+        self.assertEqual(assistant, {'role': 'assistant', 'content': 'FILE: a.py\nx = 1\n\n'})
+        self.assertIn('FILE: b.py again in full', instruction['content'])
+
+    def test_still_truncated_after_the_last_round_drops_the_cut_file(self):
+        parser = ai.FileBlockParser()
+        content = self.complete(reply('FILE: a.py\nx = 1\n\nFILE: b.py\ny = ', 'length'),
+                                reply('FILE: b.py\ny = 2\n\nFILE: c.py\nz = ', 'length'), parser=parser)
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(content, 'FILE: a.py\nx = 1\n\nFILE: b.py\ny = 2\n\n')
+        self.assertEqual(parser.close(), {'a.py': 'x = 1\n', 'b.py': 'y = 2\n'})
+
+    def test_follow_up_without_file_block_drops_the_cut_file(self):
+        parser = ai.FileBlockParser()
+        content = self.complete(reply('FILE: a.py\nx = 1\n\nFILE: b.py\ny = ', 'length'),
+                                reply('Désolé, je ne peux pas continuer.'), parser=parser)
+        self.assertEqual(content, 'FILE: a.py\nx = 1\n\n')
+        self.assertEqual(parser.close(), {'a.py': 'x = 1\n'})
+
+    def test_single_truncated_file_keeps_its_partial_text_after_the_last_round(self):
+        content = self.complete(reply('FILE: a.py\nline1\n', 'length'), reply('line2\n', 'length'))
+        self.assertEqual(content, 'FILE: a.py\nline1\nline2\n')
+        self.assertIn('Continue exactly where it stopped', self.requests[1]['messages'][-1]['content'])
+
+
+if __name__ == '__main__':
+    unittest.main()
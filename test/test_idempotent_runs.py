@@ -0,0 +1,77 @@
+"""Runs idempotents: identité déterministe, branche existante retrouvée et push sous bail explicite"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from support import ai, git, origin_and_clone
+
+
+class ExistingRunTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def team(self, workspace: Path, title: str = 'Fix login') -> 'ai.AITeamMCP':
+        return ai.AITeamMCP(env={'AI_TEAM_PROVIDER': 'mock', 'AI_TEAM_WORKSPACE': str(workspace),
+                                 'GITHUB_EVENT_ISSUE_NUMBER': '7', 'ISSUE_TITLE': title, 'ISSUE_BODY': ''})
+
+    def publish_run(self, origin: Path, identity: str) -> str:
+        """Branche de l'issue poussée sur origin par un run précédent; retourne son commit"""
+        work = self.root / 'previous'
+        git(self.root, 'clone', '--quiet', str(origin), str(work))
+        (work / 'login.py').write_text('ok = True\n', encoding='utf-8')
+        git(work, 'add', '.')
+        git(work, 'commit', '--quiet', '-m', '🤖 Backend Developer: Fix login', '-m', f'AI-Team-Run: {identity}')
+        git(work, 'push', '--quiet', 'origin', 'HEAD:refs/heads/ai-team-issue-7')
+        return git(work, 'rev-parse', 'HEAD')
+
+    def test_identity_and_branch_are_stable(self):
+        _, clone = origin_and_clone(self.root)
+        team = self.team(clone)
+        self.assertEqual(team.run_identity(), self.team(clone).run_identity())
+        self.assertNotEqual(team.run_identity(), self.team(clone, 'Fix logout').run_identity())
+        self.assertEqual(team.create_branch_name(), 'ai-team-issue-7')
+        self.assertIsNone(team.existing_run())
+
+    def test_remote_branch_is_found_with_its_head(self):
+        origin, _ = origin_and_clone(self.root)
+        identity = self.team(self.root).run_identity()
+        head = self.publish_run(origin, identity)
+        # Clone réduit à main (checkout partiel): la branche est récupérée à la demande
+        clone = self.root / 'single'
+        git(self.root, 'clone', '--quiet', '--single-branch', '--branch', 'main', str(origin), str(clone))
+        existing = self.team(clone).existing_run()
+        self.assertEqual((existing['identity'], existing['head']), (identity, head))
+        self.assertEqual(existing['agent'], 'Backend Developer')
+
+
+class LeasedPushTest(unittest.TestCase):
+    def test_push_is_refused_when_the_branch_moved(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            origin, clone = origin_and_clone(root)
+            pool = ai.WorktreePool(clone, root / 'worktrees')
+            with pool.lease() as path:
+                (path / 'a.txt').write_text('a\n', encoding='utf-8')
+                # Branche absente d'origin: bail vide, le premier push passe
+                self.assertTrue(pool.commit(path, 'ai-team-issue-1', 'run 1', push='origin', paths=['a.txt']))
+            observed = git(origin, 'rev-parse', 'refs/heads/ai-team-issue-1')
+            with pool.lease() as path:
+                (path / 'b.txt').write_text('b\n', encoding='utf-8')
+                # Un autre run a poussé depuis: le bail observé est périmé
+                with self.assertRaises(RuntimeError):
+                    pool.commit(path, 'ai-team-issue-1', 'run 2', push='origin', paths=['b.txt'], lease='0' * 40)
+            self.assertEqual(git(origin, 'rev-parse', 'refs/heads/ai-team-issue-1'), observed)
+            with pool.lease() as path:
+                (path / 'c.txt').write_text('c\n', encoding='utf-8')
+                self.assertTrue(pool.commit(path, 'ai-team-issue-1', 'run 3', push='origin', paths=['c.txt'],
+                                            lease=observed))
+            self.assertNotEqual(git(origin, 'rev-parse', 'refs/heads/ai-team-issue-1'), observed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+🧪 Tests du mode multi-tenant: ordonnancement équitable, déduplication et budgets par repository
+"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from support import ai
+
+
+class FairSchedulerTest(unittest.TestCase):
+    def test_noisy_repository_does_not_starve_others(self):
+        scheduler = ai.FairScheduler(default_max_in_flight=10)
+        for index in range(3):
+            scheduler.put('noisy', f'noisy-{index}')
+        scheduler.put('quiet', 'quiet-0')
+        order = [scheduler.get(timeout=0)[1] for _ in range(4)]
+        self.assertEqual(order, ['noisy-0', 'quiet-0', 'noisy-1', 'noisy-2'])
+
+    def test_in_flight_limit_and_weights(self):
+        scheduler = ai.FairScheduler(weights={'heavy': 2.0})
+        scheduler.put('heavy', 'h1', cost=2)
+        scheduler.put('light', 'l1', cost=2)
+        self.assertEqual(scheduler.get(timeout=0)[1], 'h1')
+        scheduler.put('heavy', 'h2', cost=2)
+        # Un seul job en cours par repository: h2 attend la fin de h1
+        self.assertEqual(scheduler.get(timeout=0)[1], 'l1')
+        self.assertIsNone(scheduler.get(timeout=0.01))
+        scheduler.done('heavy', 2)
+        self.assertEqual(scheduler.get(timeout=0)[1], 'h2')
+
+
+class IssueIndexTest(unittest.TestCase):
+    def test_find_is_scoped_by_repository(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            index = ai.IssueIndex(Path(tmp) / 'issues.sqlite')
+            text = 'Create a modern landing page with a hero section and pricing table'
+            index.add(text, {'task_type': 'frontend', 'task': text}, {'index.html': '<html></html>'}, scope='o/a')
+            match = index.find(text + '.', 0.8, scope='o/a')
+            self.assertEqual(match['files'], {'index.html': '<html></html>'})
+            self.assertNotIn('task', match['task_info'])
+            self.assertIsNone(index.find(text, 0.8, scope='o/b'))
+            self.assertIsNone(index.find('Fix the database migration crash on startup', 0.8, scope='o/a'))
+
+
+class TenantBudgetTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ledger = ai.UsageLedger(Path(self.tmp.name) / 'usage.sqlite')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def spend(self, repo: str, tokens: int) -> None:
+        self.ledger.record({'prompt_tokens': tokens}, 'model', 'run', repo, '1', 'feature', 'generation')
+
+    def test_tenant_usage_is_scoped_to_its_repository(self):
+        parent = ai.BudgetGuard(self.ledger, {'AI_TEAM_DAILY_TOKEN_BUDGET': '10000'})
+        guard = ai.BudgetGuard(self.ledger, {'AI_TEAM_DAILY_TOKEN_BUDGET': '100'}, repo='o/a', parent=parent)
+        self.spend('o/b', 500)
+        self.assertEqual(guard.state(), 'ok')
+        self.spend('o/a', 90)
+        self.assertEqual(guard.state(), 'throttle')
+        self.spend('o/a', 10)
+        self.assertEqual(guard.state(), 'exhausted')
+        self.assertEqual(parent.state(), 'ok')
+
+    def test_global_budget_still_applies(self):
+        parent = ai.BudgetGuard(self.ledger, {'AI_TEAM_DAILY_TOKEN_BUDGET': '100'})
+        guard = ai.BudgetGuard(self.ledger, {}, repo='o/a', parent=parent)
+        self.spend('o/b', 100)
+        self.assertEqual(guard.state(), 'exhausted')
+
+    def test_slot_counts_against_tenant_and_global_limits(self):
+        parent = ai.BudgetGuard(self.ledger, {'AI_TEAM_MAX_CONCURRENCY': '1'})
+        guard = ai.BudgetGuard(self.ledger, {'AI_TEAM_MAX_CONCURRENCY': '4'}, repo='o/a', parent=parent)
+        with guard.slot('ok'):
+            self.assertEqual((guard._in_flight, parent._in_flight), (1, 1))
+        self.assertEqual((guard._in_flight, parent._in_flight), (0, 0))
+
+
+class TenantSettingsTest(unittest.TestCase):
+    def orchestrator(self, tenants):
+        with mock.patch.dict(os.environ, {'AI_TEAM_DAILY_TOKEN_BUDGET': '1000', 'AI_TEAM_MONTHLY_TOKEN_BUDGET': '0'}):
+            return ai.MultiTenantOrchestrator(tenants, workers=1)
+
+    def test_budget_is_a_weighted_share_unless_set_by_the_tenant(self):
+        orchestrator = self.orchestrator({'repos': {
+            'o/heavy': {'weight': 3}, 'o/light': {'weight': 1},
+            'o/own': {'weight': 1, 'env': {'AI_TEAM_DAILY_TOKEN_BUDGET': '50'}}}})
+        heavy = orchestrator.budget_for('o/heavy', dict(os.environ))
+        self.assertEqual((heavy.daily_budget, heavy.repo, heavy.parent), (600, 'o/heavy', orchestrator.budget))
+        self.assertEqual(orchestrator.budget_for('o/light', dict(os.environ)).daily_budget, 200)
+        env = orchestrator.tenant_env({'repository': 'o/own', 'number': '1', 'title': '', 'body': ''})
+        self.assertEqual(orchestrator.budget_for('o/own', env).daily_budget, 50)
+        # Un budget par repository, réutilisé d'un job à l'autre
+        self.assertIs(orchestrator.budget_for('o/heavy', dict(os.environ)), heavy)
+
+    def test_client_reads_the_tenant_env(self):
+        orchestrator = self.orchestrator({'repos': {'o/solo': {'env': {'AI_TEAM_COALESCE': 'false'}}}})
+        shared = orchestrator.tenant_env({'repository': 'o/other', 'number': '1', 'title': '', 'body': ''})
+        self.assertIs(orchestrator.client_for(shared), orchestrator.llm)
+        solo = orchestrator.client_for(
+            orchestrator.tenant_env({'repository': 'o/solo', 'number': '1', 'title': '', 'body': ''}))
+        self.assertIsNot(solo, orchestrator.llm)
+        self.assertFalse(solo.coalesce)
+        self.assertIs(solo.provider, orchestrator.llm.provider)
+
+
+if __name__ == '__main__':
+    unittest.main()
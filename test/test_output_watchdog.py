@@ -0,0 +1,90 @@
+"""Surveillance des réponses en streaming: dégénérescences détectées, mémoire bornée, relance"""
+
+import tempfile
+import unittest
+from unittest import mock
+
+from support import ai
+
+
+def checked(watchdog: 'ai.OutputWatchdog', *deltas: str):
+    """Motif détecté après avoir reçu les fragments (analyse seulement à la fin)"""
+    watchdog.check_every = float('inf')
+    for delta in deltas:
+        watchdog.feed(delta)
+    return watchdog.check()
+
+
+class OutputWatchdogTest(unittest.TestCase):
+    def test_repetition(self):
+        self.assertEqual(checked(ai.OutputWatchdog(window=60, ngram=4),
+                                 'FILE: a.py\n' + 'the same line again and again\n' * 40), 'repetition')
+        self.assertIsNone(checked(ai.OutputWatchdog(window=60, ngram=4), ' '.join(f'word{i}' for i in range(200))))
+
+    def test_reasoning_only(self):
+        self.assertEqual(checked(ai.OutputWatchdog(reasoning_tokens=10), '<think>' + 'hmm, let me see. ' * 5),
+                         'reasoning_only')
+        self.assertIsNone(checked(ai.OutputWatchdog(reasoning_tokens=10), '<think>short</think>FILE: a.py'))
+
+    def test_missing_header(self):
+        prose = ' '.join(f'sentence{i}' for i in range(20))
+        self.assertEqual(checked(ai.OutputWatchdog(markers=ai.OUTPUT_MARKERS, header_tokens=10), prose), 'no_header')
+        self.assertIsNone(checked(ai.OutputWatchdog(markers=ai.OUTPUT_MARKERS, header_tokens=10),
+                                  'FILE: index.html\n' + prose))
+        self.assertIsNone(checked(ai.OutputWatchdog(markers=ai.OUTPUT_MARKERS, header_tokens=10),
+                                  '--- a/x.py\n+++ b/x.py\n@@ -1,2 +1,2 @@\n' + prose))
+
+    def test_delimiters_split_across_deltas(self):
+        prose = ' '.join(f'sentence{i}' for i in range(20))
+        watchdog = ai.OutputWatchdog(markers=ai.OUTPUT_MARKERS, header_tokens=10, reasoning_tokens=10)
+        self.assertIsNone(checked(watchdog, ' <thi', 'nk>plan', ' more</th', 'ink>\nFI', 'LE: a.py\n', prose))
+        # Un `FILE:` au milieu d'une ligne n'est pas un en-tête, même coupé entre deux fragments
+        watchdog = ai.OutputWatchdog(markers=ai.OUTPUT_MARKERS, header_tokens=10)
+        self.assertEqual(checked(watchdog, 'x' * 300, 'FILE: a.py', prose), 'no_header')
+
+    def test_memory_is_bounded(self):
+        watchdog = ai.OutputWatchdog(markers=ai.OUTPUT_MARKERS, window=60, check_every=1024)
+        watchdog.feed('FILE: a.py\n')
+        for index in range(5000):
+            watchdog.feed(f'value_{index} = {index}\n')
+        self.assertLessEqual(len(watchdog._tail), 60 * 16)
+        self.assertLessEqual(len(watchdog._answer_tail), ai.OutputWatchdog._MARKER_OVERLAP)
+
+    def test_feed_interrupts_the_stream(self):
+        watchdog = ai.OutputWatchdog(markers=ai.OUTPUT_MARKERS, header_tokens=10, check_every=16)
+        with self.assertRaises(ai.DegenerateOutput) as raised:
+            for index in range(20):
+                watchdog.feed(f'sentence{index} ')
+        self.assertEqual(raised.exception.reason, 'no_header')
+
+
+class WatchedCallTest(unittest.TestCase):
+    def test_degenerate_stream_is_cut_and_retried(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            team = ai.AITeamMCP(env={'AI_TEAM_PROVIDER': 'mock', 'AI_TEAM_WORKSPACE': tmp})
+            server = team.provider.local_server
+            good = 'FILE: a.py\nprint("ok")\n'
+            loop = 'FILE: a.py\n' + 'the same line again and again\n' * 2000
+            payloads = []
+
+            def respond(payload):
+                payloads.append(payload)
+                content = good if payload.get('frequency_penalty') else loop
+                return 200, {'choices': [{'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                             'usage': {'prompt_tokens': 10, 'completion_tokens': len(content) // 4}}
+
+            deltas = []
+            payload = {'model': 'mock', 'max_tokens': 2000, 'temperature': 0.2,
+                       'messages': [{'role': 'user', 'content': 'Generate a.py'}]}
+            with mock.patch.object(server, 'respond', side_effect=respond):
+                result = team.watched_call(payload, 30, 'generation', on_delta=deltas.append)
+        self.assertEqual(result['choices'][0]['message']['content'], good)
+        self.assertEqual(len(payloads), 2)
+        self.assertTrue(all(payload.get('stream') for payload in payloads))
+        # Le flux dégénéré est coupé bien avant sa fin
+        self.assertLess(sum(map(len, deltas)), len(loop) // 2)
+        self.assertTrue(''.join(deltas).endswith(good))
+
+
+if __name__ == '__main__':
+    unittest.main()
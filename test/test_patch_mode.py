@@ -0,0 +1,169 @@
+"""
+🧪 Tests du mode patch: choix des fichiers, analyse des diffs unifiés et application tolérante des hunks
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from support import ai, git
+
+
+class ParseUnifiedDiffTest(unittest.TestCase):
+    def test_files_and_hunks(self):
+        patches = ai.parse_unified_diff("""Voici le correctif:
+```diff
+--- a/src/app.py
++++ b/src/app.py
+@@ -10,3 +10,3 @@
+ def total(items):
+-    return sum(items)
++    return round(sum(items), 2)
+
+--- a/README.md
++++ b/README.md
+@@ -1,2 +1,3 @@
+ # Projet
++Nouvelle ligne
+```""")
+        self.assertEqual(list(patches), ['src/app.py', 'README.md'])
+        hunk = patches['src/app.py'][0]
+        self.assertEqual(hunk.old_start, 10)
+        self.assertEqual(hunk.lines, [(' ', 'def total(items):'), ('-', '    return sum(items)'),
+                                      ('+', '    return round(sum(items), 2)'), (' ', '')])
+
+    def test_new_and_deleted_files(self):
+        patches = ai.parse_unified_diff("""--- /dev/null
++++ b/tests/test_new.py
+@@ -0,0 +1,2 @@
++def test_ok():
++    assert True
+--- a/legacy.py
++++ /dev/null
+@@ -1,2 +0,0 @@
+-x = 1
+-y = 2
+""")
+        self.assertEqual(patches['tests/test_new.py'][0].old_start, 0)
+        self.assertIsNone(patches['legacy.py'])
+
+    def test_context_only_hunks_are_dropped(self):
+        self.assertEqual(ai.parse_unified_diff("--- a/a.py\n+++ b/a.py\n@@ -1,1 +1,1 @@\n x = 1\n"), {})
+
+
+def hunk(old_start, *lines):
+    result = ai.Hunk(old_start)
+    result.lines = [(line[0], line[1:]) for line in lines]
+    return result
+
+
+class ApplyHunksTest(unittest.TestCase):
+    ORIGINAL = '\n'.join(['import os', '', 'def total(items):', '    return sum(items)', '',
+                          'def count(items):', '    return len(items)', ''])
+
+    def test_exact_match(self):
+        text, fuzzed, failed = ai.apply_hunks(self.ORIGINAL, [
+            hunk(3, ' def total(items):', '-    return sum(items)', '+    return round(sum(items), 2)')])
+        self.assertIn('    return round(sum(items), 2)', text.split('\n'))
+        self.assertEqual((fuzzed, failed), (0, []))
+
+    def test_wrong_line_number_is_found_by_content(self):
+        text, fuzzed, failed = ai.apply_hunks(self.ORIGINAL, [
+            hunk(40, ' def count(items):', '-    return len(items)', '+    return len(list(items))')])
+        self.assertEqual(text.split('\n')[6], '    return len(list(items))')
+        self.assertEqual((fuzzed, failed), (0, []))
+
+    def test_whitespace_differences_are_fuzzed(self):
+        text, fuzzed, failed = ai.apply_hunks(self.ORIGINAL, [
+            hunk(3, ' def total( items ):', '-  return sum(items)', '+    return 0')])
+        lines = text.split('\n')
+        # Le contexte garde le texte du fichier, pas celui du modèle
+        self.assertEqual(lines[2:4], ['def total(items):', '    return 0'])
+        self.assertEqual((fuzzed, failed), (1, []))
+
+    def test_mismatched_outer_context_is_trimmed(self):
+        text, fuzzed, failed = ai.apply_hunks(self.ORIGINAL, [
+            hunk(5, ' # contexte inventé', ' def count(items):', '-    return len(items)', '+    return 0')])
+        self.assertEqual(text.split('\n')[5:7], ['def count(items):', '    return 0'])
+        self.assertEqual((fuzzed, failed), (1, []))
+
+    def test_later_hunks_follow_added_lines(self):
+        text, _, failed = ai.apply_hunks(self.ORIGINAL, [
+            hunk(1, ' import os', '+import sys', '+import json'),
+            hunk(6, ' def count(items):', '-    return len(items)', '+    return 0')])
+        self.assertEqual(failed, [])
+        self.assertEqual(text.split('\n')[:3], ['import os', 'import sys', 'import json'])
+        self.assertEqual(text.split('\n')[8], '    return 0')
+
+    def test_unmatched_hunk_is_reported_and_file_kept(self):
+        rejected = hunk(3, ' def missing():', '-    pass', '+    return 1')
+        text, fuzzed, failed = ai.apply_hunks(self.ORIGINAL, [rejected])
+        self.assertEqual(text, self.ORIGINAL)
+        self.assertEqual(failed, [rejected])
+
+    def test_new_file(self):
+        text, _, failed = ai.apply_hunks('', [hunk(0, '+print("ok")')])
+        self.assertEqual((text.strip(), failed), ('print("ok")', []))
+
+
+class ExcerptWindowsTest(unittest.TestCase):
+    def test_windows_around_matching_lines(self):
+        text = '\n'.join(f'line {i}' for i in range(1000)).replace('line 500', 'compute_total = 1')
+        windows = ai.excerpt_windows(text, {'compute_total'}, limit=1000, context=5)
+        self.assertEqual(windows, [(495, 506)])
+
+    def test_limit_and_fallback_to_file_start(self):
+        text = '\n'.join(f'line {i}' for i in range(1000))
+        self.assertEqual(ai.excerpt_windows(text, {'absent'}, limit=1000, context=5), [(0, 6)])
+        self.assertEqual(ai.excerpt_windows(text, {'absent'}, limit=10, context=5), [])
+
+
+class PatchCandidatesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.workspace = Path(self.tmp.name)
+        git(self.workspace, 'init', '--quiet')
+        files = {
+            'src/billing.py': 'def compute_invoice_total(lines):\n    return sum(lines)\n',
+            'src/report.py': 'from billing import compute_invoice_total\n',
+            'src/users.py': 'def load_users():\n    return []\n',
+            'docs/guide.md': '# Guide\n',
+        }
+        for name, text in files.items():
+            (self.workspace / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.workspace / name).write_text(text, encoding='utf-8')
+        git(self.workspace, 'add', '.')
+        self.team = ai.AITeamMCP(env={'AI_TEAM_PROVIDER': 'mock', 'AI_TEAM_WORKSPACE': str(self.workspace)})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def candidates(self, task):
+        read = []
+        original = Path.read_bytes
+
+        def read_bytes(path):
+            read.append(path.relative_to(self.workspace).as_posix())
+            return original(path)
+
+        with mock.patch.object(Path, 'read_bytes', read_bytes):
+            return self.team.patch_candidates(task), sorted(read)
+
+    def test_only_files_matching_the_task_are_read(self):
+        chosen, read = self.candidates('Fix the rounding bug in compute_invoice_total')
+        self.assertEqual(read, ['src/billing.py', 'src/report.py'])
+        self.assertEqual(set(chosen), {'src/billing.py', 'src/report.py'})
+        self.assertIsNone(chosen['src/billing.py'][1])
+
+    def test_file_named_in_the_task_is_read_without_matching_terms(self):
+        chosen, read = self.candidates('Typo in guide.md')
+        self.assertEqual(read, ['docs/guide.md'])
+        self.assertEqual(list(chosen), ['docs/guide.md'])
+
+    def test_no_match(self):
+        self.assertEqual(self.candidates('Nothing relevant here'), ({}, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
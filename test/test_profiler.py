@@ -0,0 +1,66 @@
+"""Profilage par étape: pics mémoire imbriqués et étapes ouvertes depuis plusieurs threads"""
+
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from support import ai
+
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.profiler = ai.Profiler()
+        self.profiler.configure(Path(self.tmp.name), interval_ms=0.5)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def summary(self):
+        return json.loads((Path(self.tmp.name) / 'summary.json').read_text(encoding='utf-8'))
+
+    def test_nested_stage_keeps_the_outer_peak(self):
+        self.profiler.start()
+        with self.profiler.stage('outer'):
+            block = bytearray(8 * 1024 * 1024)
+            del block
+            with self.profiler.stage('inner'):
+                small = [0] * 100
+                del small
+        self.profiler.stop()
+        stages = self.summary()['stages']
+        self.assertGreaterEqual(stages['outer']['peak_memory_bytes'], 8 * 1024 * 1024)
+        self.assertLess(stages['inner']['peak_memory_bytes'], 1024 * 1024)
+        self.assertGreaterEqual(self.summary()['peak_memory_bytes'], 8 * 1024 * 1024)
+
+    def test_stages_from_worker_threads_while_sampling(self):
+        self.profiler.start()
+        errors = []
+
+        def work(index):
+            try:
+                for _ in range(300):
+                    with self.profiler.stage(f'stage-{index % 4}'):
+                        with self.profiler.stage('nested'):
+                            pass
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(index,)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.profiler.stop()
+        self.assertEqual(errors, [])
+        stages = self.summary()['stages']
+        self.assertEqual(stages['nested']['calls'], 8 * 300)
+        self.assertEqual(sum(stages[f'stage-{index}']['calls'] for index in range(4)), 8 * 300)
+        self.assertEqual(self.profiler._stage_by_thread, {})
+        self.assertTrue((Path(self.tmp.name) / 'flamegraph.folded').exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+"""Fournisseurs LLM interchangeables (catalogue, endpoint local, sondage des capacités, erreurs)"""
+
+import contextlib
+import io
+import os
+import unittest
+from unittest import mock
+
+from support import ai
+
+
+class LoadProviderTest(unittest.TestCase):
+    def test_unknown_provider(self):
+        with self.assertRaises(ValueError):
+            ai.load_provider({'AI_TEAM_PROVIDER': 'inconnu'})
+
+    def test_same_configuration_shares_one_provider(self):
+        env = {'AI_TEAM_PROVIDER': 'openai', 'OPENAI_API_KEY': 'k', 'AI_TEAM_LLM_URL': 'http://127.0.0.1:9/v1/chat/completions'}
+        provider = ai.load_provider(env)
+        self.assertIs(ai.load_provider(dict(env)), provider)
+        self.assertEqual(provider.url, env['AI_TEAM_LLM_URL'])
+        self.assertIsNot(ai.load_provider(dict(env, OPENAI_API_KEY='autre')), provider)
+
+    def test_local_server_is_started_for_mock(self):
+        provider = ai.load_provider({'AI_TEAM_PROVIDER': 'mock'})
+        self.assertIsNotNone(provider.local_server)
+        self.assertEqual(provider.url, provider.local_server.url)
+        self.assertEqual(provider.model('classification'), 'mock')
+
+
+class ProbeTest(unittest.TestCase):
+    def test_probe_detects_capabilities_and_caches_them(self):
+        provider = ai.load_provider({'AI_TEAM_PROVIDER': 'mock'})
+        prompts = []
+        respond = provider.local_server.respond
+        with mock.patch.object(provider.local_server, 'respond',
+                               side_effect=lambda payload: prompts.append(payload) or respond(payload)), \
+                mock.patch.dict(os.environ, {'AI_TEAM_PROBE_TTL': '0'}):
+            caps = provider.ensure_capabilities()
+        self.assertEqual((caps['json_mode'], caps['streaming'], caps['max_context']), (True, True, 32768))
+        json_probe = next(payload for payload in prompts if 'response_format' in payload)
+        # OpenAI refuse json_object sans le mot « JSON » dans le prompt
+        self.assertIn('JSON', json_probe['messages'][-1]['content'])
+        with mock.patch.object(provider, 'probe', side_effect=AssertionError('cache ignoré')):
+            self.assertTrue(provider.ensure_capabilities()['json_mode'])
+
+
+class MissingKeyTest(unittest.TestCase):
+    def test_error_message_does_not_embed_a_key(self):
+        env = {'AI_TEAM_PROVIDER': 'together', 'TOGETHER_AI_API_KEY': '', 'AI_TEAM_LLM_MODE': 'live'}
+        output = io.StringIO()
+        with mock.patch.dict(os.environ, env), mock.patch.object(ai.WarmUp, 'start', lambda self: self), \
+                mock.patch.object(ai, 'set_github_output'), contextlib.redirect_stdout(output), \
+                self.assertRaises(SystemExit):
+            ai.main()
+        self.assertIn('TOGETHER_AI_API_KEY', output.getvalue())
+        self.assertNotRegex(output.getvalue(), r'[0-9a-f]{32}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+"""Regroupement des requêtes identiques en vol: partage du résultat, erreurs, annulations et asyncio"""
+
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from support import ai
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_concurrent_calls_share_one_result(self):
+        flights = ai.SingleFlight()
+        started, release, calls, results = threading.Event(), threading.Event(), [], []
+
+        def leader_call():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {'value': [1]}
+
+        leader = threading.Thread(target=lambda: results.append(flights.do('k', leader_call)))
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=lambda: results.append(flights.do('k', lambda: calls.append(2))))
+        follower.start()
+        time.sleep(0.05)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+        self.assertEqual(calls, [1])
+        self.assertEqual(sorted(shared for _, shared in results), [False, True])
+        first, second = (result for result, _ in results)
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+
+    def test_errors_are_not_cached(self):
+        flights = ai.SingleFlight()
+        with self.assertRaises(RuntimeError):
+            flights.do('k', lambda: (_ for _ in ()).throw(RuntimeError('boom')))
+        self.assertEqual(flights.do('k', lambda: 42), (42, False))
+
+    def test_follower_can_stop_waiting(self):
+        flights = ai.SingleFlight()
+        started, release, results = threading.Event(), threading.Event(), []
+        leader = threading.Thread(target=lambda: results.append(
+            flights.do('k', lambda: started.set() or release.wait(5) and 'done')))
+        leader.start()
+        started.wait(5)
+        stop = threading.Event()
+
+        def poll():
+            if stop.is_set():
+                raise ai.GenerationCancelled(0, shared=True)
+
+        stop.set()
+        with self.assertRaises(ai.GenerationCancelled):
+            flights.do('k', lambda: 'jamais appelé', poll=poll, interval=0.01)
+        # L'appel partagé continue pour le meneur
+        release.set()
+        leader.join(5)
+        self.assertEqual(results, [('done', False)])
+
+    def test_do_async_shares_with_threads(self):
+        flights = ai.SingleFlight()
+        started, release, calls = threading.Event(), threading.Event(), []
+
+        def work():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {'value': 1}
+
+        async def scenario():
+            leader = asyncio.ensure_future(flights.do_async('k', work))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            follower = asyncio.ensure_future(flights.do_async('k', lambda: calls.append(2)))
+            thread_result = asyncio.get_running_loop().run_in_executor(None, flights.do, 'k', lambda: calls.append(3))
+            await asyncio.sleep(0.05)
+            # Annuler la tâche meneuse n'annule pas l'appel partagé
+            leader.cancel()
+            release.set()
+            return await follower, await thread_result
+
+        follower, thread_result = asyncio.run(scenario())
+        self.assertEqual(calls, [1])
+        self.assertEqual((follower, thread_result), (({'value': 1}, True), ({'value': 1}, True)))
+
+
+class CoalescedCallTest(unittest.TestCase):
+    """Deux appelants (threads) d'une même requête LLM, le second rejoignant le vol du premier"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        env = {'AI_TEAM_PROVIDER': 'mock', 'AI_TEAM_WORKSPACE': self.tmp.name}
+        self.leader = ai.AITeamMCP(env=env)
+        self.follower = ai.AITeamMCP(env=env, llm=self.leader.llm)
+        self.payload = {'model': 'mock', 'max_tokens': 2000, 'temperature': 0.2,
+                        'messages': [{'role': 'user', 'content': 'Generate a.py'}]}
+        self.joined = threading.Event()
+        self.good = {'choices': [{'message': {'role': 'assistant', 'content': 'FILE: a.py\nx = 1\n'},
+                                  'finish_reason': 'stop'}], 'usage': {'prompt_tokens': 5, 'completion_tokens': 5}}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_both(self, first_attempt):
+        """Le meneur exécute first_attempt une fois le suiveur en attente; les appels suivants réussissent"""
+        chats = []
+
+        def chat(payload, timeout, on_delta=None, key=None):
+            chats.append(payload)
+            if len(chats) == 1:
+                self.joined.wait(5)
+                time.sleep(0.05)
+                return first_attempt(on_delta)
+            return self.good
+
+        outcomes = {}
+
+        def call(name, team):
+            try:
+                outcomes[name] = team.watched_call(self.payload, 30, 'generation')
+            except Exception as e:
+                outcomes[name] = e
+
+        with mock.patch.object(self.leader.llm, 'chat', side_effect=chat), \
+                mock.patch.object(self.leader, 'account_usage') as leader_usage, \
+                mock.patch.object(self.follower, 'account_usage') as follower_usage:
+            leader = threading.Thread(target=call, args=('leader', self.leader))
+            leader.start()
+            while not chats:
+                time.sleep(0.005)
+            follower = threading.Thread(target=call, args=('follower', self.follower))
+            follower.start()
+            self.joined.set()
+            leader.join(5)
+            follower.join(5)
+        return outcomes, chats, leader_usage, follower_usage
+
+    def test_aborted_stream_is_charged_to_the_leader_only(self):
+        def degenerate(on_delta):
+            raise ai.DegenerateOutput('repetition', 4000)
+
+        outcomes, _, leader_usage, follower_usage = self.run_both(degenerate)
+        self.assertEqual(outcomes['leader'], self.good)
+        self.assertEqual(outcomes['follower'], self.good)
+        aborted = [c for c in leader_usage.call_args_list if c.args[0]['usage']['completion_tokens'] == 1000]
+        self.assertEqual(len(aborted), 1)
+        self.assertFalse([c for c in follower_usage.call_args_list
+                          if c.args[0]['usage']['completion_tokens'] == 1000])
+
+    def test_follower_reissues_when_the_leader_is_cancelled(self):
+        self.leader.cancelled = threading.Event()
+
+        def cancelled(on_delta):
+            self.leader.cancelled.set()
+            on_delta('FILE: a.py\n')
+
+        outcomes, chats, _, _ = self.run_both(cancelled)
+        self.assertIsInstance(outcomes['leader'], ai.GenerationCancelled)
+        # Le suiveur (non spéculatif) relance la requête au lieu d'échouer avec le meneur
+        self.assertEqual(outcomes['follower'], self.good)
+        self.assertEqual(len(chats), 2)
+
+    def test_cancelled_follower_stops_waiting(self):
+        self.follower.cancelled = threading.Event()
+        self.follower.cancelled.set()
+
+        def slow(on_delta):
+            time.sleep(0.3)
+            return self.good
+
+        outcomes, chats, _, follower_usage = self.run_both(slow)
+        self.assertEqual(outcomes['leader'], self.good)
+        self.assertIsInstance(outcomes['follower'], ai.GenerationCancelled)
+        self.assertEqual(len(chats), 1)
+        follower_usage.assert_not_called()
+
+
+class AsyncCallTest(unittest.TestCase):
+    def test_acall_llm(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            team = ai.AITeamMCP(env={'AI_TEAM_PROVIDER': 'mock', 'AI_TEAM_WORKSPACE': tmp})
+            payload = {'model': 'mock', 'max_tokens': 2000, 'messages': [{'role': 'user', 'content': 'Generate'}]}
+            result = asyncio.run(team.acall_llm(payload, 30, 'generation'))
+        self.assertTrue(result['choices'][0]['message']['content'].startswith('FILE: index.html'))
+        self.assertFalse(team.raw_responses[-1]['shared'])
+
+
+if __name__ == '__main__':
+    unittest.main()
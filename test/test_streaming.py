@@ -0,0 +1,90 @@
+"""Découpage des fichiers au fil du streaming: FileBlockParser alimenté fragment par fragment"""
+
+import tempfile
+import unittest
+from unittest import mock
+
+from support import ai
+
+
+def reply(content: str, finish_reason: str = 'stop'):
+    return 200, {'choices': [{'message': {'role': 'assistant', 'content': content}, 'finish_reason': finish_reason}],
+                 'usage': {'prompt_tokens': 10, 'completion_tokens': len(content) // 4}}
+
+
+class FileBlockParserTest(unittest.TestCase):
+    def test_chunked_feed_matches_a_single_feed(self):
+        content = 'Intro\nFILE: a.py\n```python\nx = 1\n```\n\nFILE: b/c.txt\nhello\nworld\n'
+        parser = ai.FileBlockParser()
+        for start in range(0, len(content), 3):
+            parser.feed(content[start:start + 3])
+        self.assertEqual(parser.close(), ai.split_file_blocks(content))
+        self.assertEqual(parser.files, {'a.py': 'x = 1\n', 'b/c.txt': 'hello\nworld\n'})
+
+    def test_large_bodies_are_spilled_while_streaming(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            parser = ai.FileBlockParser(spill_bytes=64, spill_dir=tmp)
+            parser.feed('FILE: big.txt\n')
+            for index in range(100):
+                parser.feed(f'line {index}\n')
+            files = parser.close()
+            self.assertIsInstance(files['big.txt'], ai.SpilledText)
+            self.assertEqual(ai.file_text(files['big.txt']).splitlines()[-1], 'line 99')
+            # Relance: les fichiers déjà déversés sont supprimés
+            parser.reset()
+            self.assertEqual((parser.files, parser.fed), ({}, 0))
+            self.assertFalse(ai.os.listdir(tmp))
+
+
+class StreamedFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.team = ai.AITeamMCP(env={'AI_TEAM_PROVIDER': 'mock', 'AI_TEAM_WORKSPACE': self.tmp.name})
+        self.payload = {'model': 'mock', 'max_tokens': 2000, 'temperature': 0.2,
+                        'messages': [{'role': 'user', 'content': 'Generate files'}]}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def complete(self, *responses, **env):
+        parser = ai.FileBlockParser()
+        progress = []
+        queue = list(responses)
+        with mock.patch.object(self.team.provider.local_server, 'respond', side_effect=lambda payload: queue.pop(0)), \
+                mock.patch.object(ai, 'split_file_blocks', side_effect=AssertionError('découpage du texte complet')):
+            content = self.team.complete_files(self.payload, 30, 'generation',
+                                               on_delta=lambda text: progress.append(parser.fed), parser=parser)
+        return content, parser.close(), progress
+
+    def test_parser_is_fed_from_the_stream(self):
+        body = ''.join(f'<li>{index}</li>\n' for index in range(100))
+        content, files, progress = self.complete(reply(f'FILE: index.html\n{body}FILE: style.css\nbody {{}}\n'))
+        self.assertEqual(files, {'index.html': body[:-1], 'style.css': 'body {}\n'})
+        # Analyse au fil des fragments de 64 caractères, pas en une fois à la fin
+        self.assertGreater(len(progress), 10)
+        self.assertEqual(progress[0], 64)
+        self.assertEqual(progress[-1], len(content))
+
+    def test_truncated_block_is_replaced_by_the_continuation(self):
+        _, files, _ = self.complete(
+            reply('FILE: a.py\nx = 1\n\nFILE: b.py\ny = ', 'length'),
+            reply('Sure, continuing.\nFILE: b.py\ny = 2\n\nFILE: c.py\nz = 3\n'))
+        self.assertEqual(files, {'a.py': 'x = 1\n', 'b.py': 'y = 2\n', 'c.py': 'z = 3\n'})
+
+    def test_single_file_continues_in_the_same_block(self):
+        content, files, _ = self.complete(reply('FILE: a.py\nline1\nli', 'length'), reply('ne2\n'))
+        self.assertEqual(content, 'FILE: a.py\nline1\nline2\n')
+        self.assertEqual(files, {'a.py': 'line1\nline2\n'})
+
+    def test_response_without_deltas_is_parsed_once_complete(self):
+        # Fournisseur sans streaming: aucun fragment, la réponse complète alimente le parser
+        self.team.provider.capabilities['streaming'] = False
+        try:
+            content, files, progress = self.complete(reply('FILE: a.py\nx = 1\n'))
+        finally:
+            self.team.provider.capabilities['streaming'] = True
+        self.assertEqual((progress, files), ([], {'a.py': 'x = 1\n'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+🧪 Enregistrement et rejeu des échanges LLM (TranscriptLLMClient, AI_TEAM_LLM_MODE)
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from support import ai
+
+
+def reply(content: str):
+    return 200, {'choices': [{'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                 'usage': {'prompt_tokens': 10, 'completion_tokens': 5}}
+
+
+class TranscriptTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.transcript = Path(self.tmp.name) / 'transcript.jsonl.gz'
+        self.provider = ai.load_provider({'AI_TEAM_PROVIDER': 'mock'})
+        self.payload = {'model': 'mock', 'max_tokens': 100, 'messages': [{'role': 'user', 'content': 'Bonjour'}]}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def client(self, mode: str) -> ai.LLMClient:
+        return ai.create_llm_client(self.provider, {'AI_TEAM_LLM_MODE': mode, 'AI_TEAM_TRANSCRIPT': str(self.transcript),
+                                                    'AI_TEAM_CIRCUIT_BREAKER': 'false'})
+
+    def record(self, *contents: str) -> None:
+        recorder = self.client('record')
+        queue = [reply(content) for content in contents]
+        with mock.patch.object(self.provider.local_server, 'respond', side_effect=lambda payload: queue.pop(0)):
+            for _ in contents:
+                recorder.chat(self.payload, 30)
+
+    def content(self, response):
+        return response['choices'][0]['message']['content']
+
+    def test_replay_serves_recorded_responses_in_order_without_network(self):
+        self.record('premier', 'second')
+        player = self.client('replay')
+        self.assertIsInstance(player, ai.TranscriptLLMClient)
+        with mock.patch.object(self.provider.local_server, 'respond', side_effect=AssertionError('appel réseau')):
+            replies = [self.content(player.chat(self.payload, 30)) for _ in range(3)]
+        # Au-delà des réponses enregistrées, la dernière est resservie
+        self.assertEqual(replies, ['premier', 'second', 'second'])
+
+    def test_replay_is_keyed_by_the_original_request(self):
+        self.record('réponse')
+        player = self.client('replay')
+        adjusted = dict(self.payload, max_tokens=10)
+        self.assertEqual(self.content(player.chat(adjusted, 30, key=ai.request_key(self.payload))), 'réponse')
+        with self.assertRaises(ai.LLMReplayMiss):
+            player.chat(adjusted, 30)
+
+    def test_aborted_generation_is_replayed_as_aborted(self):
+        recorder = self.client('record')
+        recorder.probe()
+
+        def degenerate(text):
+            raise ai.DegenerateOutput('repetition', 42)
+
+        with mock.patch.object(self.provider.local_server, 'respond', return_value=reply('x' * 200)), \
+                self.assertRaises(ai.DegenerateOutput):
+            recorder.chat(self.payload, 30, on_delta=degenerate)
+        with self.assertRaises(ai.DegenerateOutput) as caught:
+            self.client('replay').chat(self.payload, 30)
+        self.assertEqual((caught.exception.reason, caught.exception.chars), ('repetition', 42))
+
+    def test_missing_transcript(self):
+        with self.assertRaises(FileNotFoundError):
+            self.client('replay')
+
+    def test_live_mode_is_a_plain_client(self):
+        self.assertIs(type(self.client('live')), ai.LLMClient)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+🧪 Pool de worktrees git: prêt, recyclage sans reclonage et commit des jobs concurrents
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from support import ai, git, origin_and_clone
+
+
+class WorktreePoolTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        _, self.clone = origin_and_clone(self.root)
+        self.pool = ai.WorktreePool(self.clone, self.root / 'worktrees', max_idle=1)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_released_worktree_is_reset_and_reused(self):
+        with self.pool.lease() as path:
+            (path / 'README.md').write_text('modifié\n', encoding='utf-8')
+            (path / 'build').mkdir()
+            (path / 'build' / 'out.txt').write_text('généré\n', encoding='utf-8')
+            first = path
+        with self.pool.lease() as path:
+            self.assertEqual(path, first)
+            self.assertEqual((path / 'README.md').read_text(encoding='utf-8'), '# Projet\n')
+            self.assertFalse((path / 'build').exists())
+            self.assertEqual(git(path, 'status', '--porcelain'), '')
+
+    def test_concurrent_leases_and_idle_limit(self):
+        with self.pool.lease() as first, self.pool.lease() as second:
+            self.assertNotEqual(first, second)
+            self.assertEqual(git(first, 'rev-parse', 'HEAD'), git(self.clone, 'rev-parse', 'HEAD'))
+        # max_idle=1: un seul worktree libre est conservé, l'autre est supprimé
+        self.assertEqual(len([path for path in (first, second) if path.exists()]), 1)
+        kept = first if first.exists() else second
+        # Un nouveau pool (run suivant) reprend le worktree laissé sur disque
+        with ai.WorktreePool(self.clone, self.root / 'worktrees').lease() as path:
+            self.assertEqual(path, kept)
+
+    def test_commit_puts_only_the_changed_paths_on_the_branch(self):
+        with self.pool.lease() as path:
+            self.assertFalse(self.pool.commit(path, 'ai-team-issue-1', 'vide'))
+            (path / 'app.py').write_text('print("ok")\n', encoding='utf-8')
+            (path / 'notes.tmp').write_text('brouillon\n', encoding='utf-8')
+            self.assertTrue(self.pool.commit(path, 'ai-team-issue-1', 'run', run_identity='abc', paths=['app.py']))
+        # Branche visible depuis le clone partagé, sans le fichier non demandé
+        self.assertEqual(git(self.clone, 'ls-tree', '--name-only', 'ai-team-issue-1'), 'README.md\napp.py')
+        self.assertIn('AI-Team-Run: abc', git(self.clone, 'log', '-1', '--format=%B', 'ai-team-issue-1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+"""Écriture des fichiers générés: fusion des fichiers structurés, états de create_files et sorties"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from support import ai
+
+
+class MergeTest(unittest.TestCase):
+    def test_merge_json_keeps_existing_values(self):
+        existing = {'name': 'app', 'scripts': {'test': 'jest'}, 'files': ['a']}
+        generated = {'name': 'other', 'scripts': {'test': 'mocha', 'lint': 'eslint'}, 'files': ['a', 'b'],
+                     'private': True}
+        self.assertEqual(ai.merge_json(existing, generated), {
+            'name': 'app', 'scripts': {'test': 'jest', 'lint': 'eslint'}, 'files': ['a', 'b'], 'private': True})
+
+    def test_merge_json_reports_changed_values(self):
+        conflicts = []
+        ai.merge_json({'name': 'app', 'scripts': {'test': 'jest'}, 'files': ['a']},
+                      {'name': 'app', 'scripts': {'test': 'mocha'}, 'files': ['b']}, conflicts)
+        self.assertEqual(conflicts, ['scripts.test'])
+
+    def test_merge_structured_json(self):
+        existing = '{"name": "app",  "version": "1.0.0"}'
+        # Rien à ajouter: le fichier existant est rendu tel quel, sans reformatage
+        self.assertIs(ai.merge_structured('package.json', existing, '{"name": "app"}'), existing)
+        merged = ai.merge_structured('package.json', existing, '{"license": "MIT"}')
+        self.assertEqual(merged, '{\n  "name": "app",\n  "version": "1.0.0",\n  "license": "MIT"\n}\n')
+
+    def test_merge_structured_conflict(self):
+        with self.assertRaises(ai.MergeConflict) as raised:
+            ai.merge_structured('package.json', '{"name": "app", "version": "1.0.0"}',
+                                '{"version": "2.0.0", "license": "MIT"}')
+        self.assertEqual(raised.exception.keys, ['version'])
+
+    def test_merge_structured_invalid_json(self):
+        self.assertIsNone(ai.merge_structured('data.json', 'not json', '{}'))
+        with self.assertRaises(ValueError):
+            ai.merge_structured('package.json', '{}', 'not json')
+
+    def test_merge_structured_env(self):
+        existing = 'API_KEY=secret\n'
+        self.assertIs(ai.merge_structured('.env.example', existing, 'API_KEY=\n# PORT=1\n'), existing)
+        self.assertEqual(ai.merge_structured('.env', existing, 'API_KEY=\nPORT=3000\n'),
+                         'API_KEY=secret\nPORT=3000\n')
+
+    def test_other_files_are_not_merged(self):
+        self.assertIsNone(ai.merge_structured('index.html', '<p>a</p>', '<p>b</p>'))
+
+
+class CreateFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.workspace = Path(self.tmp.name) / 'workspace'
+        self.workspace.mkdir()
+        self.team = ai.AITeamMCP(env={'AI_TEAM_PROVIDER': 'mock', 'AI_TEAM_WORKSPACE': str(self.workspace)})
+        self.task = {'agent': 'Backend Developer', 'task': 'Fix login'}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name: str, text: str) -> None:
+        path = self.workspace / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding='utf-8')
+
+    def read(self, name: str) -> str:
+        return (self.workspace / name).read_text(encoding='utf-8')
+
+    def test_statuses(self):
+        self.write('same.py', 'x = 1\n')
+        self.write('old.py', 'x = 1\n')
+        self.write('package.json', '{"name": "app"}')
+        self.write('tsconfig.json', '{"strict": true}')
+        self.write('config.json', '{"port": 80}')
+        self.write('broken.json', '{"a": 1}')
+        changes = self.team.create_files({
+            'new/app.py': 'print(1)\n',
+            'same.py': 'x = 1\n',
+            'old.py': 'x = 2\n',
+            'package.json': '{"name": "app", "license": "MIT"}',
+            'tsconfig.json': '{"strict": true}\n',
+            'config.json': '{"port": 8080}',
+            'broken.json': 'not json',
+            '../outside.py': 'x = 1\n',
+            '.git/config': '[core]\n',
+        }, self.task)
+        self.assertEqual(changes, {
+            'new/app.py': 'created', 'same.py': 'unchanged', 'old.py': 'updated', 'package.json': 'merged',
+            'tsconfig.json': 'unchanged', 'config.json': 'conflict', 'broken.json': 'kept',
+            '../outside.py': 'rejected', '.git/config': 'rejected'})
+        self.assertEqual(self.read('old.py'), 'x = 2\n')
+        self.assertIn('"license": "MIT"', self.read('package.json'))
+        # Conflit: l'existant n'est pas réécrit
+        self.assertEqual(self.read('config.json'), '{"port": 80}')
+        self.assertFalse((Path(self.tmp.name) / 'outside.py').exists())
+        self.assertFalse((self.workspace / '.git').exists())
+
+    def test_patched_and_deleted_files(self):
+        self.write('data.json', '{"a": 1}')
+        self.write('gone.py', 'x = 1\n')
+        self.team.patched_files = {'data.json'}
+        self.team.deleted_files = {'gone.py', 'missing.py'}
+        changes = self.team.create_files({'data.json': '{"a": 2}'}, self.task)
+        # Mode patch: la version existante est déjà prise en compte, écrite telle quelle
+        self.assertEqual(changes, {'data.json': 'updated', 'gone.py': 'deleted', 'missing.py': 'unchanged'})
+        self.assertFalse((self.workspace / 'gone.py').exists())
+
+    def test_write_failure(self):
+        self.write('blocked', 'x')
+        changes = self.team.create_files({'blocked/app.py': 'x = 1\n'}, self.task)
+        self.assertEqual(changes, {'blocked/app.py': 'failed'})
+
+    def test_readme_is_stable_between_runs(self):
+        files = {'app.py': 'x = 1\n'}
+        readme = self.team.add_readme(files, self.task)['AI-TEAM-README.md']
+        self.assertEqual(self.team.create_files({'AI-TEAM-README.md': readme}, self.task),
+                         {'AI-TEAM-README.md': 'created'})
+        # Même tâche, mêmes fichiers: aucun changement à pousser
+        again = self.team.add_readme(files, self.task)['AI-TEAM-README.md']
+        self.assertEqual(self.team.create_files({'AI-TEAM-README.md': again}, self.task),
+                         {'AI-TEAM-README.md': 'unchanged'})
+
+
+class GithubOutputTest(unittest.TestCase):
+    def test_multiline_values_use_a_delimiter(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / 'output'
+            with mock.patch.dict(os.environ, {'GITHUB_OUTPUT': str(output)}):
+                ai.set_github_output('changes_made', 'true')
+                ai.set_github_output('changed_paths', 'a, b.py\nsrc/c d.py')
+            lines = output.read_text(encoding='utf-8').splitlines()
+        self.assertEqual(lines[0], 'changes_made=true')
+        delimiter = lines[1].split('<<', 1)[1]
+        self.assertEqual(lines[1:], [f'changed_paths<<{delimiter}', 'a, b.py', 'src/c d.py', delimiter])
+
+
+if __name__ == '__main__':
+    unittest.main()